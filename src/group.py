@@ -1,5 +1,12 @@
 class DummyGroup:
     """A dummy group implementation for demonstration purposes."""
+    # There is no efficient endomorphism to split scalars with (GLV). A group having one
+    # sets this to True and provides endomorphism(base) and glv_params()
+    curve_has_endomorphism = False
+    # A scalar multiplication is a single multiplication of integers here, so msm_bigint
+    # does not use Pippenger's bucket method for this group
+    scalar_mul_is_expensive = False
+
     def __init__(self, field):
         self.field = field
     
@@ -33,6 +40,27 @@ class DummyGroup:
         return self.field.order()
     
     @staticmethod
-    def pairing(a, b):
+    def miller_loop(a, b):
+        """Miller loop part of the pairing, without the final exponentiation."""
         return a * b
+
+    @staticmethod
+    def multi_miller_loop(pairs):
+        """Product of the Miller loops of several pairs, so that a single final exponentiation is needed.
+
+        The target group of this dummy pairing is written additively, so the product is a sum.
+        """
+        result = 0
+        for a, b in pairs:
+            result = result + DummyGroup.miller_loop(a, b)
+        return result
+
+    @staticmethod
+    def final_exponentiation(f):
+        """Final exponentiation of the pairing, the identity map for this dummy pairing."""
+        return f
+
+    @staticmethod
+    def pairing(a, b):
+        return DummyGroup.final_exponentiation(DummyGroup.miller_loop(a, b))
         
\ No newline at end of file
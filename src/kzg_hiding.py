@@ -8,11 +8,23 @@ from group import DummyGroup
 from unipolynomial import UniPolynomial
 from field import Field
 from random import randint
+from math import ceil, log2
+from multiprocessing import Pool
+import os
 
-# This argument is set false to not use the WNAF method for multi-scalar multiplication
-# because WNAF method is not tested yet
+# This argument is set false to not use signed digits in the Pippenger multi-scalar multiplication,
+# negation is not cheaper than addition in DummyGroup
 negation_is_cheap = False
 
+# MSMs with fewer terms than this are computed with the straightforward loop,
+# larger ones with Pippenger's bucket method, if scalar multiplication is expensive in the group
+PIPPENGER_THRESHOLD = 16
+
+# Window size and number of scalar bits covered by the fixed-base tables built in setup,
+# higher bits of a scalar are handled by a plain scalar multiplication
+FIXED_BASE_WINDOW_SIZE = 8
+FIXED_BASE_SCALAR_BITS = 64
+
 # This class is builded by ourselves.
 class Commitment:
     """Represents a commitment in the KZG scheme."""
@@ -33,13 +45,13 @@ class Commitment:
         """Add two commitments using + operator."""
         if not isinstance(other, Commitment) or self.group != other.group:
             raise TypeError("Can only add commitments from the same group")
-        return Commitment(self.group, self.group.exp(self.value, 1) + self.group.exp(other.value, 1))
+        return Commitment(self.group, self.value + other.value)
     
     def __sub__(self, other):
         """Subtract two commitments using - operator."""
         if not isinstance(other, Commitment) or self.group != other.group:
             raise TypeError("Can only subtract commitments from the same group")
-        return Commitment(self.group, self.group.scalar_mul(self.value, 1) + self.group.scalar_mul(other.value, -1))
+        return Commitment(self.group, self.value - other.value)
     
     def __mul__(self, other):
         """
@@ -85,7 +97,7 @@ class KZG10Commitment:
     # Implemented following the function 'setup' in arkworks project,
     # expect that this function enables input a secret_symbol rather than generate the beta using random function
     # and this function does not return prepared_h and prepared_beta_h which are not used in python implementation
-    def setup(self, max_degree, produce_g2_powers=False, secret_symbol = None, g1_generator = None, g2_generator = None) -> None:
+    def setup(self, max_degree, produce_g2_powers=False, secret_symbol = None, g1_generator = None, g2_generator = None, precompute_tables=False) -> None:
         """
         Generate the structured reference string (SRS).
         
@@ -94,6 +106,9 @@ class KZG10Commitment:
             produce_g2_powers: Whether to produce powers in G2
             secret_symbol: Secret value for SRS (if None, randomly generated)
             g1_generator, g2_generator: Generators for G1 and G2 (if None, randomly chosen)
+            precompute_tables: Whether to build the fixed-base tables used by commit. They take
+                2^FIXED_BASE_WINDOW_SIZE multiples per window and base, and only pay off in groups
+                where a scalar multiplication costs much more than an addition, not in DummyGroup
         
         Returns:
             Dictionary containing the SRS parameters
@@ -112,9 +127,15 @@ class KZG10Commitment:
 
         gamma_g = self.G1.field.random_element()
 
-        powers_of_s = [beta ** i for i in range(max_degree + 2)]
-        powers_of_g = [g * powers_of_s[i] for i in range(max_degree + 1)]
-        powers_of_gamma_g = [gamma_g * powers_of_s[i] for i in range(max_degree + 2)]
+        # Walk through the powers of beta once, filling both tables in the same pass
+        powers_of_g = []
+        powers_of_gamma_g = []
+        cur = 1
+        for i in range(max_degree + 2):
+            if i <= max_degree:
+                powers_of_g.append(g * cur)
+            powers_of_gamma_g.append(gamma_g * cur)
+            cur *= beta
         neg_powers_of_h = []
         if produce_g2_powers:
             neg_powers_of_beta = [1]
@@ -131,6 +152,10 @@ class KZG10Commitment:
         result['h'] = h
         result['beta_h'] = beta * h
         result['neg_powers_of_h'] = neg_powers_of_h
+        # This is added by ourselves: powers_of_g are the bases of every commitment,
+        # so their multiples can be precomputed once for msm_fixed_base
+        if precompute_tables:
+            result['precomp_g'] = [fixed_base_table(base) for base in powers_of_g]
 
         return result
     
@@ -146,6 +171,8 @@ class KZG10Commitment:
             'powers_of_g': powers_of_g,
             'powers_of_gamma_g': powers_of_gamma_g,
         }
+        if 'precomp_g' in pp:
+            powers['precomp_g'] = pp['precomp_g'][:supported_degree + 1]
 
         vk = {
             'g': pp['powers_of_g'][0],
@@ -171,15 +198,9 @@ class KZG10Commitment:
         num_powers = len(powers['powers_of_g'])
         assert num_coefficients <= num_powers, f"Too many coefficients, num_coefficients: {num_coefficients}, num_powers: {num_powers}"
         
-        # Commitment calculation
         num_leading_zeros, plain_coeffs = skip_leading_zeros_and_convert_to_bigints(polynomial)
-        commitment = msm_bigint(negation_is_cheap, powers['powers_of_g'][num_leading_zeros:], plain_coeffs)
 
-        # Debug assertion
-        if self.debug:
-            assert isinstance(commitment, Field), f"commitment: {commitment.coeffs}"
-
-        # Add hiding polynomial if hiding_bound is set
+        # Sample hiding polynomial if hiding_bound is set
         random_ints = []
         if hiding_bound is not None:
             while UniPolynomial(random_ints).degree == 0:
@@ -193,9 +214,19 @@ class KZG10Commitment:
             num_powers = len(powers['powers_of_gamma_g'])
             assert hiding_bound != 0, "Hiding bound is zero"
             assert hiding_poly_degree < num_powers, "Hiding bound is too large"
-        
-            random_commitment = msm_bigint(negation_is_cheap, powers['powers_of_gamma_g'], random_ints)
-            commitment += random_commitment
+
+        # Commitment calculation
+        # This is modified by ourselves: without fixed-base tables, the bases and scalars of the
+        # hiding commitment are appended to those of the polynomial and a single MSM is done
+        num_plain = len(plain_coeffs)
+        if 'precomp_g' in powers:
+            commitment = msm_fixed_base(powers['precomp_g'][num_leading_zeros:], plain_coeffs)
+            if random_ints:
+                commitment += msm_bigint(negation_is_cheap, powers['powers_of_gamma_g'][:len(random_ints)], random_ints, self.G1)
+        else:
+            bases = powers['powers_of_g'][num_leading_zeros:num_leading_zeros + num_plain] \
+                + powers['powers_of_gamma_g'][:len(random_ints)]
+            commitment = msm_bigint(negation_is_cheap, bases, plain_coeffs + random_ints, self.G1)
 
         # Final debug assertion
         if self.debug:
@@ -204,7 +235,7 @@ class KZG10Commitment:
         return Commitment(self.G1, commitment), random_ints
     
     # Implemented completely following the function 'compute_witness_polynomial' in arkworks project
-    def compute_witness_polynomial(self, polynomial: UniPolynomial, point, random_ints, hiding=False):
+    def compute_witness_polynomial(self, polynomial: UniPolynomial, point, random_ints, hiding=False, random_poly=None):
         """
         Compute the witness polynomial for a given polynomial and point.
         
@@ -212,21 +243,25 @@ class KZG10Commitment:
             polynomial: The polynomial to compute the witness polynomial for
             point: The point at which to evaluate the polynomial
             random_ints: Random integers used for hiding
+            random_poly: UniPolynomial(random_ints), if already built
         
         Returns:
             tuple: (witness polynomial, hiding witness polynomial)
         """
-        witness_polynomial, _pz = polynomial.division_by_linear_divisor(point)
+        witness_coeffs, _pz = self.division_by_linear_divisor(polynomial.coeffs, point)
+        witness_polynomial = UniPolynomial(witness_coeffs)
         random_witness_polynomial = None
         if hiding:
-            random_poly = UniPolynomial(random_ints)
+            if random_poly is None:
+                random_poly = UniPolynomial(random_ints)
             if self.debug:
                 assert random_poly.degree > 0, f"Degree of random poly is zero, random_ints: {random_ints}"
-            random_witness_polynomial, _pr = UniPolynomial(random_ints).division_by_linear_divisor(point)
+            random_witness_coeffs, _pr = self.division_by_linear_divisor(random_poly.coeffs, point)
+            random_witness_polynomial = UniPolynomial(random_witness_coeffs)
         return witness_polynomial, random_witness_polynomial
     
     # Implemented completely following the function 'open_with_witness_polynomial' in arkworks project
-    def open_with_witness_polynomial(self, powers, point, random_ints, witness_polynomial, hiding_witness_polynomial=None):
+    def open_with_witness_polynomial(self, powers, point, random_ints, witness_polynomial, hiding_witness_polynomial=None, random_poly=None):
         """
         Open the commitment with a witness polynomial.
         
@@ -235,6 +270,7 @@ class KZG10Commitment:
             random_ints: Random integers used for hiding
             witness_polynomial: The witness polynomial
             hiding_witness_polynomial: The hiding witness polynomial (optional)
+            random_poly: UniPolynomial(random_ints), if already built
         
         Returns:
             Dictionary containing the proof values
@@ -242,13 +278,14 @@ class KZG10Commitment:
         assert witness_polynomial.degree + 1 < len(powers['powers_of_g']), "Too many coefficients"
         num_leading_zeros, witness_coeffs = skip_leading_zeros_and_convert_to_bigints(witness_polynomial)
 
-        w = msm_bigint(negation_is_cheap, powers['powers_of_g'][num_leading_zeros:], witness_coeffs)
+        w = msm_bigint(negation_is_cheap, powers['powers_of_g'][num_leading_zeros:], witness_coeffs, self.G1)
 
         random_v = None
         if hiding_witness_polynomial is not None:
-            blinding_p = UniPolynomial(random_ints)
+            blinding_p = random_poly if random_poly is not None else UniPolynomial(random_ints)
             random_v = blinding_p.evaluate(point)
-            w += msm_bigint(negation_is_cheap, powers['powers_of_gamma_g'], hiding_witness_polynomial.coeffs)
+            hiding_coeffs = hiding_witness_polynomial.coeffs
+            w += msm_bigint(negation_is_cheap, powers['powers_of_gamma_g'][:len(hiding_coeffs)], hiding_coeffs, self.G1)
 
         return {'w': w, 'random_v': random_v}
     
@@ -267,9 +304,11 @@ class KZG10Commitment:
         """
         assert polynomial.degree + 1 < len(powers['powers_of_g']), f"Too many coefficients, polynomial.degree: {polynomial.degree}"
         
-        witness_poly, hiding_witness_poly = self.compute_witness_polynomial(polynomial, point, random_ints, hiding)
+        # This is added by ourselves: the random polynomial is built once and shared
+        random_poly = UniPolynomial(random_ints) if hiding else None
+        witness_poly, hiding_witness_poly = self.compute_witness_polynomial(polynomial, point, random_ints, hiding, random_poly)
 
-        return self.open_with_witness_polynomial(powers, point, random_ints, witness_poly, hiding_witness_poly)
+        return self.open_with_witness_polynomial(powers, point, random_ints, witness_poly, hiding_witness_poly, random_poly)
 
     # Implemented completely following the function 'check' in arkworks project
     def check(self, vk, comm: Commitment, point, value, proof, hiding=False):
@@ -288,35 +327,56 @@ class KZG10Commitment:
         inner = comm.value - vk['g'] * value
         if hiding:
             inner -= vk['gamma_g'] * proof['random_v']
-        lhs = DummyGroup.pairing(inner, vk['h'])
-        rhs = DummyGroup.pairing(proof['w'], vk['beta_h'] - vk['h'] * point)
-        return lhs.value[0] == rhs.value[0]
+        # This is modified by ourselves: e(inner, h) == e(w, beta_h - h * point) is checked as
+        # e(inner, h) * e(-w, beta_h - h * point) == 1, with a single final exponentiation
+        # (1 is 0 in the additively written target group of DummyGroup)
+        result = DummyGroup.final_exponentiation(DummyGroup.multi_miller_loop([
+            (inner, vk['h']),
+            (-proof['w'], vk['beta_h'] - vk['h'] * point),
+        ]))
+        return result == 0
     
     # Implemented completely following the function 'batch_check' in arkworks project
+    # This is modified by ourselves: all randomizers are drawn before the combination,
+    # which is done as inner products and a single MSM
     def batch_check(self, vk, commitments, points, values, proofs, hiding=False):
-        total_c = 0
-        total_w = 0
+        randomizers = [1] + [randint(0, 1 << 128) for _ in range(len(proofs) - 1)]
+        cs = [self.batch_check_term(c, z, proof) for c, z, proof in zip(commitments, points, proofs)]
+        randomizers = randomizers[:len(cs)]
 
         # combination
-        randomizer = 1
-        g_multiplier = 0
-        gamma_g_multiplier = 0
-
-        for c, z, v, proof in zip(commitments, points, values, proofs):
-            c = z * proof['w'] + c.value.value[0]
-            g_multiplier += randomizer * v
-            if hiding:
-                gamma_g_multiplier += randomizer * proof['random_v']
-            total_c += c.value[0] * randomizer
-            total_w += proof['w'] * randomizer
-            randomizer = randint(0, 1 << 128)
-
-        total_c -= vk['g'] * g_multiplier
+        g_multiplier = sum(r * v for r, v in zip(randomizers, values))
+        bases = cs + [vk['g']]
+        scalars = randomizers + [-g_multiplier]
         if hiding:
-            total_c -= vk['gamma_g'] * gamma_g_multiplier
+            gamma_g_multiplier = sum(r * proof['random_v'] for r, proof in zip(randomizers, proofs))
+            bases.append(vk['gamma_g'])
+            scalars.append(-gamma_g_multiplier)
+        total_c = msm_bigint(negation_is_cheap, bases, scalars, self.G1)
+        total_w = msm_bigint(negation_is_cheap, [proof['w'] for proof in proofs], randomizers, self.G1)
         
-        return DummyGroup.pairing(total_w, vk['beta_h']) \
-            == DummyGroup.pairing(total_c, vk['h'])
+        # e(total_w, beta_h) == e(total_c, h) is checked with a single final exponentiation, as in check
+        result = DummyGroup.final_exponentiation(DummyGroup.multi_miller_loop([
+            (total_w, vk['beta_h']),
+            (-total_c, vk['h']),
+        ]))
+        return result == 0
+
+    # This function is built by ourselves from the loop body of 'batch_check' in arkworks project
+    @staticmethod
+    def batch_check_term(c, z, proof):
+        """
+        Compute the term of a single proof in the batch check, before it is randomized.
+        
+        Args:
+            c: The commitment
+            z: The point at which the polynomial was evaluated
+            proof: The proof values
+        
+        Returns:
+            Group element z * w + c
+        """
+        return z * proof['w'] + c.value
 
     # This function is totally built by ourselves
     @staticmethod
@@ -333,16 +393,23 @@ class KZG10Commitment:
         """
         assert len(coeffs) > 1, "Polynomial degree must be at least 1"
 
-        quotient = [0] * (len(coeffs) - 1)
-        remainder = 0
+        # Like msm_bigint, run the loop on plain integers when the coefficients are
+        # Field objects holding a single integer, and wrap the results afterwards
+        wrap = False
+        plain_coeffs = [to_bigint(coeff) for coeff in coeffs]
+        plain_d = to_bigint(d)
+        if None not in plain_coeffs and plain_d is not None:
+            wrap = isinstance(d, Field) or any(isinstance(coeff, Field) for coeff in coeffs)
+            coeffs, d = plain_coeffs, plain_d
 
-        for i, coeff in enumerate(reversed(coeffs)):
-            if i == 0:
-                remainder = coeff
-            else:
-                quotient[-i] = remainder
-                remainder = remainder * d + coeff
+        quotient = [0] * (len(coeffs) - 1)
+        remainder = coeffs[-1]
+        for i in range(len(coeffs) - 2, -1, -1):
+            quotient[i] = remainder
+            remainder = remainder * d + coeffs[i]
 
+        if wrap:
+            return [Field(q) for q in quotient], Field(remainder)
         return quotient, remainder
     
     
@@ -367,7 +434,7 @@ def skip_leading_zeros_and_convert_to_bigints(p):
 
 
 # BE CAREFUL: This function is not totally tested yet
-def msm_bigint(negation_is_cheap, bases, bigints):
+def msm_bigint(negation_is_cheap, bases, bigints, group=None, parallel=None):
     """
     Perform multi-scalar multiplication using big integers.
     
@@ -375,14 +442,124 @@ def msm_bigint(negation_is_cheap, bases, bigints):
         negation_is_cheap: Whether negation is cheap in the group
         bases: List of group elements
         bigints: List of big integers
+        group: The group of the bases. Pippenger's bucket method is only used if the group sets
+            scalar_mul_is_expensive, the scalars are split with its endomorphism if it has one,
+            and the buckets are summed with its add_batch if it has one
+        parallel: Parallel mode passed to msm_bigint_pippenger ('window', 'term' or None)
     
     Returns:
         Group element representing the result of the multi-scalar multiplication
     """
-    if negation_is_cheap:
-        return msm_bigint_wnaf(bases, bigints)
+    # zip() in the MSMs stops at the shorter list, so only that many terms count
+    num_terms = min(len(bases), len(bigints))
+    bases, bigints = bases[:num_terms], bigints[:num_terms]
+
+    # Elements of DummyGroup are Field objects holding a single integer, and every
+    # Field operation builds a new object through Field._operate. When possible,
+    # the kernels run on the plain integers and the result is wrapped once
+    wrap = False
+    plain_bases = [to_bigint(base) for base in bases]
+    plain_bigints = [to_bigint(scalar) for scalar in bigints]
+    if None not in plain_bases and None not in plain_bigints:
+        wrap = num_terms > 0 and any(isinstance(base, Field) for base in bases)
+        bases, bigints = plain_bases, plain_bigints
+
+    # Small MSMs, like the hiding commitment, would spend more on the windows
+    # and buckets than on the MSM itself. In DummyGroup a scalar
+    # multiplication is a single bigint multiplication, cheaper than any bucket method
+    scalar_mul_is_expensive = group is not None and getattr(group, 'scalar_mul_is_expensive', False)
+    if num_terms < PIPPENGER_THRESHOLD or not scalar_mul_is_expensive:
+        result = msm_bigint_basic(bases, bigints)
     else:
-        return msm_bigint_basic(bases, bigints)
+        if getattr(group, 'curve_has_endomorphism', False):
+            bases, bigints = glv_expand(group, bases, bigints)
+        result = msm_bigint_pippenger(bases, bigints, signed=negation_is_cheap, parallel=parallel, group=group)
+    return Field(result) if wrap else result
+
+
+# This function is implemented by ourselves
+def glv_expand(group, bases, bigints):
+    """
+    Split every scalar k into k1 + k2 * lambda with the endomorphism of the group (GLV),
+    so that the MSM runs over twice the bases with scalars of half the bit length.
+    
+    Args:
+        group: A group with curve_has_endomorphism set, providing endomorphism(base)
+            and glv_params() returning (order, lambda, lattice basis)
+        bases: List of group elements
+        bigints: List of big integers
+    
+    Returns:
+        tuple: (expanded bases, expanded big integers)
+    """
+    plain_bigints = [to_bigint(scalar) for scalar in bigints]
+    if None in plain_bigints:
+        return bases, bigints
+
+    r, lambda_val, basis = group.glv_params()
+    k1s = []
+    k2s = []
+    for k in plain_bigints:
+        k1, k2 = scalar_glv_split(k, r, lambda_val, basis)
+        k1s.append(k1)
+        k2s.append(k2)
+    return list(bases) + [group.endomorphism(base) for base in bases], k1s + k2s
+
+
+# This function is implemented by ourselves, following Algorithm 3.74 of
+# Guide to Elliptic Curve Cryptography (Hankerson, Menezes, Vanstone)
+def glv_lattice_basis(r, lambda_val):
+    """
+    Find a short basis of the lattice {(a, b) : a + b * lambda = 0 mod r}.
+    
+    Args:
+        r: The group order
+        lambda_val: The eigenvalue of the endomorphism
+    
+    Returns:
+        tuple: ((a1, b1), (a2, b2))
+    """
+    # Extended Euclidean algorithm on (r, lambda), keeping r_i = s_i * r + t_i * lambda
+    remainders = [r, lambda_val]
+    ts = [0, 1]
+    while remainders[-1] != 0:
+        q = remainders[-2] // remainders[-1]
+        remainders.append(remainders[-2] - q * remainders[-1])
+        ts.append(ts[-2] - q * ts[-1])
+
+    # l is the largest index with r_l >= sqrt(r)
+    l = max(i for i, remainder in enumerate(remainders) if remainder * remainder >= r)
+    a1, b1 = remainders[l + 1], -ts[l + 1]
+    a2, b2 = remainders[l], -ts[l]
+    if l + 2 < len(remainders) and \
+            remainders[l + 2] ** 2 + ts[l + 2] ** 2 < a2 ** 2 + b2 ** 2:
+        a2, b2 = remainders[l + 2], -ts[l + 2]
+    return (a1, b1), (a2, b2)
+
+
+# This function is implemented by ourselves, following Algorithm 3.74 of
+# Guide to Elliptic Curve Cryptography (Hankerson, Menezes, Vanstone)
+def scalar_glv_split(k, r, lambda_val, basis):
+    """
+    Split a scalar into two scalars of about half the bit length.
+    
+    Args:
+        k: The scalar
+        r: The group order
+        lambda_val: The eigenvalue of the endomorphism
+        basis: The lattice basis returned by glv_lattice_basis
+    
+    Returns:
+        tuple: (k1, k2) with k = k1 + k2 * lambda mod r
+    """
+    (a1, b1), (a2, b2) = basis
+    k %= r
+    # Rounded divisions by r
+    c1 = (2 * b2 * k + r) // (2 * r)
+    c2 = (-2 * b1 * k + r) // (2 * r)
+    k1 = k - c1 * a1 - c2 * a2
+    k2 = -c1 * b1 - c2 * b2
+    return k1, k2
 
 
 # This is a simple implementation of multi-scalar multiplication using big integers
@@ -404,37 +581,278 @@ def msm_bigint_basic(bases, bigints):
     return result
 
 
-# BE CAREFUL: This function is not totally tested yet
-def msm_bigint_wnaf(bases, bigints):
+# This is an implementation of Pippenger's bucket method built by ourselves
+def msm_bigint_pippenger(bases, bigints, c=None, signed=False, parallel=None, processes=None, group=None):
     """
-    Implementation of multi-scalar multiplication using big integers and the Window NAF method.
+    Implementation of multi-scalar multiplication using big integers and Pippenger's bucket method.
     
     Args:
         bases: List of group elements
         bigints: List of big integers
+        c: Window size in bits (if None, chosen from the number of bases)
+        signed: Whether to use signed digits, which halves the number of buckets
+            but needs a negation per negative digit
+        parallel: None to run in this process, 'window' to give each window to a worker
+            process, or 'term' to split the bases among worker processes
+        processes: Number of worker processes (if None, the number of CPUs)
+        group: The group of the bases. If it provides add_batch(pairs), the buckets
+            are summed with batched additions
     
     Returns:
         Group element representing the result of the multi-scalar multiplication
     """
-    WINDOW_SIZE = 5
+    nonzero_bases = []
+    nonzero_bigints = []
+    for base, scalar in zip(bases, bigints):
+        k = to_bigint(scalar)
+        if k is None:
+            # The scalar cannot be split into bits, e.g. a non-integer field value
+            return msm_bigint_basic(bases, bigints)
+        if k < 0:
+            base, k = -base, -k
+        if k:
+            nonzero_bases.append(base)
+            nonzero_bigints.append(k)
+
+    if not nonzero_bases:
+        return 0
+
+    if c is None:
+        c = max(3, ceil(log2(len(nonzero_bases))) - 2)
+
+    if parallel == 'term':
+        # Every worker computes the MSM of a slice of the terms, the results are summed
+        processes = min(processes or os.cpu_count() or 1, len(nonzero_bases))
+        chunk_size = ceil(len(nonzero_bases) / processes)
+        tasks = [(nonzero_bases[i:i + chunk_size], nonzero_bigints[i:i + chunk_size], c, signed, None, None, group)
+                 for i in range(0, len(nonzero_bases), chunk_size)]
+        with Pool(len(tasks)) as pool:
+            partial_results = pool.starmap(msm_bigint_pippenger, tasks)
+        result = 0
+        for partial_result in partial_results:
+            result += partial_result
+        return result
+    assert parallel in (None, 'window'), f"Unknown parallel mode: {parallel}"
+
+    # The digits are stored window by window, digit_columns[w][j] being the digit of
+    # the j-th scalar in window w, so each window reads one list. The scalars are sorted
+    # by decreasing number of digits, so a window only lists the scalars reaching it
+    digit_rows = [scalar_digits(k, c, signed) for k in nonzero_bigints]
+    order = sorted(range(len(digit_rows)), key=lambda j: len(digit_rows[j]), reverse=True)
+    nonzero_bases = [nonzero_bases[j] for j in order]
+    digit_rows = [digit_rows[j] for j in order]
+    num_windows = len(digit_rows[0])
+    digit_columns = []
+    active_end = len(digit_rows)
+    for window_idx in range(num_windows):
+        while len(digit_rows[active_end - 1]) <= window_idx:
+            active_end -= 1
+        digit_columns.append([digit_rows[j][window_idx] for j in range(active_end)])
+    neg_bases = [-base for base in nonzero_bases] if signed else None
+    num_buckets = 1 << (c - 1) if signed else (1 << c) - 1
+
+    add_batch = getattr(group, 'add_batch', None) if group is not None else None
+    tasks = [(nonzero_bases, neg_bases, digit_column, num_buckets, add_batch) for digit_column in digit_columns]
+    if parallel == 'window':
+        with Pool(min(processes or os.cpu_count() or 1, num_windows)) as pool:
+            window_sums = pool.starmap(pippenger_window_sum, tasks)
+    else:
+        window_sums = [pippenger_window_sum(*task) for task in tasks]
+
     result = 0
+    for window_idx in reversed(range(num_windows)):
+        if window_idx != num_windows - 1:
+            for _ in range(c):
+                result = result + result
+        result += window_sums[window_idx]
+
+    return result
+
+
+# This function is implemented by ourselves
+def pippenger_window_sum(bases, neg_bases, digit_column, num_buckets, add_batch=None):
+    """
+    Compute sum_j digit_column[j] * bases[j] for one window of Pippenger's bucket method.
     
-    # Precompute window
-    precomp = [[base * i for i in range(1 << (WINDOW_SIZE - 1))] for base in bases]
+    Args:
+        bases: List of group elements
+        neg_bases: List of the negated bases, needed only for negative digits
+        digit_column: List of the digits of the scalars in this window
+        num_buckets: Number of buckets, the largest absolute value of a digit
+        add_batch: The add_batch function of the group, if it has one
     
-    for i in range(max(next_power_of_two(bigint) for bigint in bigints)):
-        result = result + result
-        for j, (base, scalar) in enumerate(zip(bases, bigints)):
-            if next_power_of_two(scalar) > i:
-                window = (scalar >> i) & ((1 << WINDOW_SIZE) - 1)
-                if window:
-                    if window >= (1 << (WINDOW_SIZE - 1)):
-                        result -= precomp[j][window - (1 << (WINDOW_SIZE - 1))]
-                    else:
-                        result += precomp[j][window - 1]
+    Returns:
+        Group element representing the sum of this window
+    """
+    # Put every base into the bucket of its digit in this window,
+    # bucket i holds the bases with digit +-(i + 1)
+    if add_batch is None:
+        buckets = [0] * num_buckets
+        for j, digit in enumerate(digit_column):
+            if digit > 0:
+                buckets[digit - 1] += bases[j]
+            elif digit < 0:
+                buckets[-digit - 1] += neg_bases[j]
+    else:
+        pending = [[] for _ in range(num_buckets)]
+        for j, digit in enumerate(digit_column):
+            if digit > 0:
+                pending[digit - 1].append(bases[j])
+            elif digit < 0:
+                pending[-digit - 1].append(neg_bases[j])
+        buckets = batch_sum(pending, add_batch)
+
+    # sum_i (i + 1) * buckets[i] computed with running sums
+    running = 0
+    total = 0
+    for bucket in reversed(buckets):
+        running += bucket
+        total += running
+    return total
+
+
+# This function is implemented by ourselves
+def batch_sum(lists, add_batch):
+    """
+    Sum every list of group elements with addition trees, where all the additions
+    of one level, across all the lists, are done by a single call to add_batch.
+    A curve group in affine coordinates can share a single field inversion among
+    all these additions (Montgomery's trick).
     
-    return result
+    Args:
+        lists: List of lists of group elements
+        add_batch: Function adding a list of pairs of group elements
+    
+    Returns:
+        List with the sum of each list (0 for an empty list)
+    """
+    lists = [list(elements) for elements in lists]
+    while any(len(elements) > 1 for elements in lists):
+        pairs = []
+        for elements in lists:
+            pairs.extend(zip(elements[0::2], elements[1::2]))
+        sums = iter(add_batch(pairs))
+        for i, elements in enumerate(lists):
+            halved = [next(sums) for _ in range(len(elements) // 2)]
+            if len(elements) % 2:
+                halved.append(elements[-1])
+            lists[i] = halved
+    return [elements[0] if elements else 0 for elements in lists]
+
+
+# This function is implemented by ourselves
+def scalar_digits(k, c, signed=False):
+    """
+    Split a non-negative integer into c-bit digits, from the lowest window to the highest.
+    
+    Args:
+        k: The non-negative integer
+        c: Window size in bits
+        signed: If True, digits lie in [-2^(c-1), 2^(c-1)) instead of [0, 2^c)
+    
+    Returns:
+        List of digits such that k = sum_i digits[i] * 2^(i*c)
+    """
+    mask = (1 << c) - 1
+    half = 1 << (c - 1)
+    digits = []
+    while k:
+        digit = k & mask
+        k >>= c
+        if signed and digit >= half:
+            digit -= 1 << c
+            k += 1
+        digits.append(digit)
+    return digits
+
+
+# This function is implemented by ourselves
+def to_bigint(x):
+    """
+    Convert an integer or a Field element into a python integer.
+    
+    Args:
+        x: An integer or a Field element holding a single integer
+    
+    Returns:
+        The integer value, or None if x does not hold an integer
+    """
+    if isinstance(x, Field):
+        if len(x.value) != 1:
+            return None
+        x = x.value[0]
+    if isinstance(x, int):
+        return x
+    return None
+
+
+# This function is implemented by ourselves
+def fixed_base_table(base, c=FIXED_BASE_WINDOW_SIZE, num_bits=FIXED_BASE_SCALAR_BITS):
+    """
+    Precompute the multiples of a fixed base used by msm_fixed_base.
+    
+    Args:
+        base: The group element
+        c: Window size in bits
+        num_bits: Number of scalar bits covered by the table
+    
+    Returns:
+        Table such that table[w][m - 1] = m * 2^(w*c) * base for 1 <= m < 2^c
+    """
+    table = []
+    for _ in range((num_bits + c - 1) // c):
+        row = [base]
+        for _ in range((1 << c) - 2):
+            row.append(row[-1] + base)
+        table.append(row)
+        base = row[-1] + base
+    return table
+
+
+# This is a fixed-base multi-scalar multiplication built by ourselves
+def msm_fixed_base(precomp_table, bigints, c=FIXED_BASE_WINDOW_SIZE):
+    """
+    Multi-scalar multiplication with bases precomputed by fixed_base_table.
     
+    Args:
+        precomp_table: List of tables, one per base
+        bigints: List of big integers
+        c: Window size in bits the tables were built with
+    
+    Returns:
+        Group element representing the result of the multi-scalar multiplication
+    """
+    mask = (1 << c) - 1
+    result = 0
+    for table, scalar in zip(precomp_table, bigints):
+        base = table[0][0]
+        k = to_bigint(scalar)
+        if k is None:
+            result += base * scalar
+            continue
+
+        negative = k < 0
+        if negative:
+            k = -k
+        # Each window is a single lookup into the table
+        window_sum = 0
+        for row in table:
+            if not k:
+                break
+            digit = k & mask
+            if digit:
+                window_sum += row[digit - 1]
+            k >>= c
+        if k:
+            # Bits beyond the table
+            window_sum += base * (k << (len(table) * c))
+
+        if negative:
+            result -= window_sum
+        else:
+            result += window_sum
+    return result
+
 
 # This function is implemented by ourselves
 def next_power_of_two(n):
@@ -448,12 +866,7 @@ def next_power_of_two(n):
         The next power of two
     """
     assert n >= 0, "No negative integer"
-    d = n
-    k = 0
-    while d > 0:
-        d >>= 1
-        k += 1
-    return k
+    return n.bit_length()
 
 
 if __name__ == '__main__':
@@ -45,5 +45,10 @@ class TestDummyGroup(unittest.TestCase):
     def test_pairing(self):
         self.assertEqual(DummyGroup.pairing(2, 3), 6)
 
+    def test_multi_miller_loop(self):
+        f = DummyGroup.multi_miller_loop([(2, 3), (-3, 2)])
+        self.assertEqual(DummyGroup.final_exponentiation(f), 0)
+        self.assertEqual(DummyGroup.final_exponentiation(DummyGroup.miller_loop(2, 3)), DummyGroup.pairing(2, 3))
+
 if __name__ == '__main__':
     unittest.main()
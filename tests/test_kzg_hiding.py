@@ -5,6 +5,8 @@ sys.path.append('../src')
 sys.path.append('src')
 
 from kzg_hiding import KZG10Commitment, UniPolynomial, DummyGroup, Field, Commitment
+from kzg_hiding import msm_bigint, msm_bigint_basic, msm_bigint_pippenger, scalar_digits, next_power_of_two
+from kzg_hiding import fixed_base_table, msm_fixed_base, batch_sum, glv_lattice_basis, scalar_glv_split
 
 class TestKZG10Commitment(unittest.TestCase):
     def setUp(self):
@@ -21,6 +23,26 @@ class TestKZG10Commitment(unittest.TestCase):
         self.assertIn('neg_powers_of_h', params)
         self.assertEqual(len(params['powers_of_g']), self.max_degree + 1)
         self.assertEqual(len(params['powers_of_gamma_g']), self.max_degree + 2)
+        self.assertNotIn('precomp_g', params)
+
+    def test_division_by_linear_divisor(self):
+        # Nonzero leading coefficient, so that UniPolynomial keeps every quotient coefficient
+        for coeffs in [[randint(0, 100) for _ in range(7)] + [randint(1, 100)],
+                       [Field.random_element() for _ in range(7)] + [Field(randint(1, 100))]]:
+            point = randint(0, 100)
+            quotient, remainder = KZG10Commitment.division_by_linear_divisor(coeffs, point)
+            expected_quotient, expected_remainder = UniPolynomial(coeffs).division_by_linear_divisor(point)
+            self.assertEqual(quotient, expected_quotient.coeffs)
+            self.assertEqual(remainder, expected_remainder)
+
+    def test_setup_powers(self):
+        beta = Field(7)
+        params = self.kzg.setup(self.max_degree, secret_symbol=beta, g1_generator=3, g2_generator=5)
+        for i, p in enumerate(params['powers_of_g']):
+            self.assertEqual(p, Field(3) * beta ** i)
+        gamma_g = params['powers_of_gamma_g'][0]
+        for i, p in enumerate(params['powers_of_gamma_g']):
+            self.assertEqual(p, gamma_g * beta ** i)
 
     def test_commit(self):
         params = self.kzg.setup(self.max_degree)
@@ -106,5 +128,147 @@ class TestKZG10Commitment(unittest.TestCase):
         
         self.assertFalse(self.kzg.batch_check(vk, commitments, points, values, proofs, True))
 
+    def test_commitment_add_sub(self):
+        group = DummyGroup(Field)
+        a = Commitment(group, Field(7))
+        b = Commitment(group, Field(3))
+        self.assertEqual((a + b).value, Field(10))
+        self.assertEqual((a - b).value, Field(4))
+        with self.assertRaises(TypeError):
+            a + Commitment(DummyGroup(Field), Field(3))
+
+# The scalar field of BN254 with a cube root of unity, acting on Z_r by multiplication
+GLV_R = 0x30644e72e131a029b85045b68181585d2833e84879b9709143e1f593f0000001
+GLV_LAMBDA = pow(5, (GLV_R - 1) // 3, GLV_R)
+
+class EndomorphismGroup:
+    curve_has_endomorphism = True
+    scalar_mul_is_expensive = True
+
+    def endomorphism(self, base):
+        return base * GLV_LAMBDA % GLV_R
+
+    def glv_params(self):
+        return GLV_R, GLV_LAMBDA, glv_lattice_basis(GLV_R, GLV_LAMBDA)
+
+class TestMSM(unittest.TestCase):
+    def test_pippenger(self):
+        for n in [1, 5, 16, 40]:
+            bases = [Field.random_element() for _ in range(n)]
+            scalars = [randint(0, 1 << 64) for _ in range(n)]
+            self.assertEqual(msm_bigint_pippenger(bases, scalars), msm_bigint_basic(bases, scalars))
+
+    def test_pippenger_field_and_negative_scalars(self):
+        bases = [Field.random_element() for _ in range(20)]
+        scalars = [Field(randint(-1000, 1000)) for _ in range(10)] + [randint(-1000, 1000) for _ in range(10)]
+        self.assertEqual(msm_bigint_pippenger(bases, scalars, 3), msm_bigint_basic(bases, scalars))
+
+    def test_pippenger_parallel(self):
+        bases = [Field.random_element() for _ in range(40)]
+        scalars = [randint(-(1 << 64), 1 << 64) for _ in range(40)]
+        expected = msm_bigint_basic(bases, scalars)
+        for parallel in ['window', 'term']:
+            self.assertEqual(msm_bigint_pippenger(bases, scalars, parallel=parallel, processes=2), expected)
+            self.assertEqual(msm_bigint_pippenger(bases, scalars, signed=True, parallel=parallel, processes=2), expected)
+
+    def test_pippenger_signed(self):
+        for c in [3, 4, 7]:
+            bases = [Field.random_element() for _ in range(20)]
+            scalars = [randint(-(1 << 64), 1 << 64) for _ in range(20)]
+            self.assertEqual(msm_bigint_pippenger(bases, scalars, c, signed=True), msm_bigint_basic(bases, scalars))
+
+    def test_batch_sum(self):
+        lists = [[], [Field(3)], [randint(0, 100) for _ in range(7)], [Field.random_element() for _ in range(16)]]
+        add_batch = lambda pairs: [a + b for a, b in pairs]
+        self.assertEqual(batch_sum(lists, add_batch), [sum(elements) for elements in lists])
+
+    def test_scalar_digits(self):
+        for k in [1, 31, 255, randint(0, 1 << 128)]:
+            for signed in [False, True]:
+                digits = scalar_digits(k, 3, signed)
+                self.assertEqual(sum(d << (3 * i) for i, d in enumerate(digits)), k)
+                if signed:
+                    self.assertTrue(all(-4 <= d < 4 for d in digits))
+
+    def test_fixed_base(self):
+        bases = [Field.random_element() for _ in range(10)]
+        tables = [fixed_base_table(base, 4, 16) for base in bases]
+        scalars = [randint(0, 1 << 16) for _ in range(4)] + [randint(-(1 << 40), 1 << 40) for _ in range(4)] + [Field(3), 0]
+        self.assertEqual(msm_fixed_base(tables, scalars, 4), msm_bigint_basic(bases, scalars))
+
+    def test_commit_without_precomp(self):
+        kzg = KZG10Commitment(DummyGroup(Field), DummyGroup(Field))
+        params = kzg.setup(20, secret_symbol=Field(3), precompute_tables=True)
+        powers, vk = kzg.trim(params, 20)
+        poly = UniPolynomial([randint(0, 100) for _ in range(20)])
+        commitment, _ = kzg.commit(powers, poly)
+        del powers['precomp_g']
+        self.assertEqual(kzg.commit(powers, poly)[0].value, commitment.value)
+
+    def test_commit_hiding_value(self):
+        kzg = KZG10Commitment(DummyGroup(Field), DummyGroup(Field))
+        params = kzg.setup(20, precompute_tables=True)
+        powers, vk = kzg.trim(params, 20)
+        poly = UniPolynomial([0, 0] + [randint(0, 100) for _ in range(18)])
+        for use_precomp in [True, False]:
+            if not use_precomp:
+                del powers['precomp_g']
+            commitment, random_ints = kzg.commit(powers, poly, 3)
+            expected = msm_bigint_basic(powers['powers_of_g'], poly.coeffs) \
+                + msm_bigint_basic(powers['powers_of_gamma_g'], random_ints)
+            self.assertEqual(commitment.value, expected)
+
+    def test_scalar_glv_split(self):
+        basis = glv_lattice_basis(GLV_R, GLV_LAMBDA)
+        for _ in range(10):
+            k = randint(0, GLV_R - 1)
+            k1, k2 = scalar_glv_split(k, GLV_R, GLV_LAMBDA, basis)
+            self.assertEqual((k1 + k2 * GLV_LAMBDA) % GLV_R, k)
+            self.assertLessEqual(abs(k1).bit_length(), 130)
+            self.assertLessEqual(abs(k2).bit_length(), 130)
+
+    def test_msm_bigint_glv(self):
+        bases = [randint(0, GLV_R - 1) for _ in range(20)]
+        scalars = [randint(0, GLV_R - 1) for _ in range(20)]
+        result = msm_bigint(False, bases, scalars, EndomorphismGroup())
+        self.assertEqual(result % GLV_R, msm_bigint_basic(bases, scalars) % GLV_R)
+
+    def test_next_power_of_two(self):
+        self.assertEqual(next_power_of_two(0), 0)
+        self.assertEqual(next_power_of_two(1), 1)
+        self.assertEqual(next_power_of_two(8), 4)
+        self.assertEqual(next_power_of_two(255), 8)
+
+    def test_msm_bigint(self):
+        bases = [Field.random_element() for _ in range(30)]
+        scalars = [randint(0, 1 << 32) for _ in range(30)]
+        self.assertEqual(msm_bigint(False, bases, scalars), msm_bigint_basic(bases, scalars))
+        self.assertIsInstance(msm_bigint(False, bases, scalars), Field)
+        self.assertEqual(msm_bigint(True, bases, scalars), msm_bigint_basic(bases, scalars))
+        # Only four terms although there are many bases, as in the hiding commitment
+        self.assertEqual(msm_bigint(True, bases, scalars[:4]), msm_bigint_basic(bases, scalars[:4]))
+
+    def test_msm_bigint_expensive_scalar_mul(self):
+        class ExpensiveGroup:
+            scalar_mul_is_expensive = True
+
+        bases = [Field.random_element() for _ in range(30)]
+        scalars = [randint(0, 1 << 32) for _ in range(30)]
+        for negation in [False, True]:
+            self.assertEqual(msm_bigint(negation, bases, scalars, ExpensiveGroup()), msm_bigint_basic(bases, scalars))
+
+    def test_pippenger_group_add_batch(self):
+        class BatchGroup:
+            calls = 0
+
+            def add_batch(self, pairs):
+                BatchGroup.calls += 1
+                return [a + b for a, b in pairs]
+
+        bases = [Field.random_element() for _ in range(30)]
+        scalars = [randint(0, 1 << 32) for _ in range(30)]
+        self.assertEqual(msm_bigint_pippenger(bases, scalars, group=BatchGroup()), msm_bigint_basic(bases, scalars))
+        self.assertGreater(BatchGroup.calls, 0)
+
 if __name__ == '__main__':
     unittest.main()